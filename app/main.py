@@ -1,16 +1,27 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from supabase import create_client, Client
-from typing import List
+from postgrest.exceptions import APIError
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from cachetools import TTLCache
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import pytz
 import groq
+import httpx
 from pydantic import BaseModel
-from imap_tools import MailBox, AND
+from bs4 import BeautifulSoup
+from imap_tools import MailBox, MailMessage, AND, OR
+from imap_tools.errors import MailboxFetchError, MailboxLoginError
+from imap_tools.utils import check_command_status, chunks
 import logging
-import ssl
+import asyncio
+import hashlib
+import imaplib
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -37,69 +48,413 @@ supabase: Client = create_client(
     os.getenv("SUPABASE_KEY", "")
 )
 
-# Initialize Groq client
-groq_client = groq.Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-# Create emails table if it doesn't exist
-try:
-    logger.info("Checking/Creating emails table in Supabase")
-    # Check if table exists by attempting to select from it
-    supabase.table("emails").select("*").limit(1).execute()
-except Exception as e:
-    logger.warning(f"Emails table might not exist: {str(e)}")
-    logger.info("Please create the following table in Supabase:")
-    logger.info("""
-    create table if not exists emails (
-        id bigint generated by default as identity primary key,
-        subject text,
-        from_address text,
-        to_address text,
-        date timestamp with time zone,
-        text text,
-        summary text,
-        extracted_at timestamp with time zone default timezone('utc'::text, now())
-    );
-    """)
+# Initialize Groq client on an HTTP/2 connection pool sized for concurrent summaries
+groq_http = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+    timeout=30.0
+)
+groq_async = groq.AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), http_client=groq_http)
+
+# Small, fast model; summaries of short emails don't need a larger one
+SUMMARY_MODEL = "llama-3.1-8b-instant"
+
+# Short-lived cache of /emails responses, so polling clients don't re-run the query.
+# The version is bumped whenever /extract stores rows, so older entries are never read.
+_emails_cache: TTLCache = TTLCache(maxsize=32, ttl=5)
+_emails_cache_version = 0
+
+# Maximum rows per Supabase insert request, to bound payload size
+INSERT_CHUNK_SIZE = 500
+# Longest time a partial batch waits for more summaries before it is inserted
+INSERT_FLUSH_SECONDS = 0.5
+
+# Shared system prompt, built once rather than per summary
+_SYSTEM_MSG = {
+    "role": "system",
+    "content": "Summarize this email in under 100 words. Bullet key points and action items."
+}
+
+# Maximum number of concurrent Groq requests, to stay within rate limits
+SUMMARY_CONCURRENCY = 8
+
+# Summary text stored by earlier versions when Groq failed; such rows are treated as unsummarized
+FAILED_SUMMARY = "Failed to generate summary"
+# Content hashes per Supabase summary lookup, to keep the query string well under URL limits
+SUMMARY_LOOKUP_CHUNK_SIZE = 100
+
+# Number of summaries kept in the in-process cache, keyed by content hash
+SUMMARY_CACHE_SIZE = 1024
+_summary_cache: "OrderedDict[str, str]" = OrderedDict()
+
+# Email bodies are truncated to this many characters at extraction time
+MAX_BODY_CHARS = 8000
+
+# IMAP server settings
+IMAP_SERVER = "imap.zoho.eu"
+# Number of messages requested per IMAP FETCH command
+IMAP_FETCH_BULK = 100
+# Leading bytes of each message fetched for summarization: room for the headers
+# and the first MAX_BODY_CHARS of text without downloading attachments
+MAX_FETCH_BYTES = 64 * 1024
+# Ping idle pooled sessions before the server's ~30 minute idle timeout
+IMAP_KEEPALIVE_SECONDS = 25 * 60
+# Maximum number of parallel IMAP connections
+IMAP_CONCURRENCY = 4
+# Idle sessions kept per account; extras are logged out to respect server connection limits
+IMAP_MAX_IDLE_SESSIONS = 2
+
+# imap_tools is blocking, so IMAP work runs on this thread pool
+_imap_executor = ThreadPoolExecutor(max_workers=IMAP_CONCURRENCY)
+
+# Idle IMAP sessions reused across /extract calls, keyed by account credentials
+_mailbox_pool: Dict[Tuple[str, str], List[MailBox]] = {}
+_pool_lock = asyncio.Lock()
 
 class EmailRequest(BaseModel):
     email_address: str
     password: str
     sender_addresses: List[str]
 
-def summarize_single_email(email_content: dict) -> str:
-    """Summarize a single email using Groq."""
+async def summarize_single_email(email_content: dict) -> Optional[str]:
+    """Summarize a single email using Groq, returning None if generation fails."""
     try:
         email_text = (
             f"Subject: {email_content['subject']}\n"
             f"From: {email_content['from_address']}\n"
             f"Date: {email_content['date']}\n"
-            f"Content: {email_content['text'][:2000]}..."  
+            f"Content: {email_content['text']}"
         )
         
         logger.info(f"Generating summary for email: {email_content['subject'][:30]}...")
-        chat_completion = groq_client.chat.completions.create(
+        chat_completion = await groq_async.chat.completions.create(
             messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that summarizes emails. Provide a concise summary of the key points and any important action items. Keep the summary under 200 words."
-                },
-                {
-                    "role": "user",
-                    "content": f"Please provide a brief summary of this email:\n{email_text}"
-                }
+                _SYSTEM_MSG,
+                {"role": "user", "content": email_text}
             ],
-            model="mixtral-8x7b-32768",
+            model=SUMMARY_MODEL,
             temperature=0.5,
-            max_tokens=200
+            max_tokens=150
         )
         
         return chat_completion.choices[0].message.content
     except Exception as e:
         logger.error(f"Failed to generate summary for email: {str(e)}")
-        return "Failed to generate summary"
+        return None
+
+def content_hash(email_content: dict) -> str:
+    """Hash the fields a summary is generated from, used to reuse earlier summaries."""
+    key = f"{email_content['subject']}|{email_content['from_address']}|{email_content['text']}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+def message_identity(msg: MailMessage, msg_date: datetime) -> str:
+    """Return the Message-ID header, or a hash of date, sender and subject when it is missing."""
+    message_id = msg.headers.get("message-id", ("",))[0].strip()
+    if message_id:
+        return message_id
+    key = f"{msg_date.isoformat()}|{msg.from_}|{msg.subject}"
+    return "generated:" + hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+def _cache_summary(digest: str, summary: str) -> None:
+    _summary_cache[digest] = summary
+    _summary_cache.move_to_end(digest)
+    if len(_summary_cache) > SUMMARY_CACHE_SIZE:
+        _summary_cache.popitem(last=False)
+
+async def summarize_emails(email_data: List[dict], queue: Optional[asyncio.Queue] = None) -> None:
+    """Set the summary of each email, reusing cached summaries for content seen before.
+
+    Lookups go to the in-process cache first, then to stored rows in Supabase.
+    Remaining emails are summarized concurrently, bounded by SUMMARY_CONCURRENCY;
+    a failed summary is left as None so a later extract retries it.
+    If a queue is given, each email is put on it as soon as its summary is set, as an
+    (email, overwrite) pair where overwrite marks a freshly generated summary that
+    should replace the summary of an already stored row for the same message.
+    """
+    summaries: Dict[str, str] = {}
+    for email_content in email_data:
+        digest = email_content["content_hash"]
+        if digest in _summary_cache:
+            _summary_cache.move_to_end(digest)
+            summaries[digest] = _summary_cache[digest]
+
+    misses = list(dict.fromkeys(e["content_hash"] for e in email_data if e["content_hash"] not in summaries))
+    for i in range(0, len(misses), SUMMARY_LOOKUP_CHUNK_SIZE):
+        try:
+            response = await asyncio.to_thread(
+                supabase.table("emails")
+                .select("content_hash,summary")
+                .in_("content_hash", misses[i:i + SUMMARY_LOOKUP_CHUNK_SIZE])
+                .execute
+            )
+            for row in response.data:
+                if row["summary"] and row["summary"] != FAILED_SUMMARY:
+                    summaries[row["content_hash"]] = row["summary"]
+                    _cache_summary(row["content_hash"], row["summary"])
+        except Exception as e:
+            logger.warning(f"Summary cache lookup failed: {str(e)}")
+
+    # Emails grouped by content hash, so identical content is summarized once
+    by_digest: Dict[str, List[dict]] = {}
+    for email_content in email_data:
+        by_digest.setdefault(email_content["content_hash"], []).append(email_content)
+
+    async def set_summary(digest: str, summary: Optional[str], overwrite: bool) -> None:
+        for email_content in by_digest[digest]:
+            email_content["summary"] = summary
+            if queue is not None:
+                await queue.put((email_content, overwrite))
+
+    for digest, summary in summaries.items():
+        await set_summary(digest, summary, overwrite=False)
+
+    pending = [digest for digest in by_digest if digest not in summaries]
+    logger.info(f"Reusing {len(email_data) - len(pending)} cached summaries, generating {len(pending)}")
+
+    sem = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def sem_bounded_summarize(digest: str) -> None:
+        async with sem:
+            summary = await summarize_single_email(by_digest[digest][0])
+        if summary is not None:
+            _cache_summary(digest, summary)
+        await set_summary(digest, summary, overwrite=summary is not None)
+
+    await asyncio.gather(*(sem_bounded_summarize(digest) for digest in pending))
+
+@app.on_event("shutdown")
+async def close_groq_client():
+    """Close the Groq HTTP connection pool."""
+    await groq_async.close()
+
+def _pool_key(email_address: str, password: str) -> Tuple[str, str]:
+    """Key pooled sessions by address and password hash so a session is only reused with valid credentials."""
+    return email_address, hashlib.sha256(password.encode()).hexdigest()
+
+async def _close_mailbox(mailbox: MailBox) -> None:
+    """Log out of an IMAP session, ignoring errors from sessions that are already dead."""
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(_imap_executor, mailbox.logout)
+    except Exception as e:
+        logger.debug(f"Ignoring error while closing IMAP session: {str(e)}")
+
+async def _return_to_pool(key: Tuple[str, str], mailbox: MailBox) -> None:
+    """Add a session to the idle pool, closing it instead if the pool for key is full."""
+    async with _pool_lock:
+        idle = _mailbox_pool.setdefault(key, [])
+        if len(idle) < IMAP_MAX_IDLE_SESSIONS:
+            idle.append(mailbox)
+            return
+    await _close_mailbox(mailbox)
+
+async def get_mailbox(email_address: str, password: str) -> MailBox:
+    """Check out a logged-in IMAP session from the pool, connecting if none is usable."""
+    key = _pool_key(email_address, password)
+    loop = asyncio.get_running_loop()
+    while True:
+        # Only pop under the lock; the network probe runs without holding it
+        async with _pool_lock:
+            idle = _mailbox_pool.get(key)
+            mailbox = idle.pop() if idle else None
+        if mailbox is None:
+            break
+        try:
+            # Cheap liveness probe before handing the session out
+            await loop.run_in_executor(_imap_executor, mailbox.client.noop)
+            logger.debug(f"Reusing pooled IMAP session for {email_address}")
+            return mailbox
+        except (imaplib.IMAP4.error, OSError) as e:
+            logger.info(f"Dropping stale IMAP session for {email_address}: {str(e)}")
+            await _close_mailbox(mailbox)
+
+    logger.debug(f"Opening new IMAP session for {email_address}")
+    return await loop.run_in_executor(
+        _imap_executor,
+        lambda: MailBox(IMAP_SERVER).login(email_address, password, initial_folder='INBOX')
+    )
+
+async def release_mailbox(email_address: str, password: str, mailbox: MailBox) -> None:
+    """Return an IMAP session to the pool for reuse by later requests."""
+    await _return_to_pool(_pool_key(email_address, password), mailbox)
+
+async def _keep_mailboxes_alive():
+    """Periodically NOOP idle pooled sessions so the server does not drop them."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(IMAP_KEEPALIVE_SECONDS)
+        # Take the idle sessions out of the pool so they are probed without holding the lock
+        async with _pool_lock:
+            idle_sessions = [(key, mailbox) for key, idle in _mailbox_pool.items() for mailbox in idle]
+            _mailbox_pool.clear()
+        for key, mailbox in idle_sessions:
+            try:
+                await loop.run_in_executor(_imap_executor, mailbox.client.noop)
+            except (imaplib.IMAP4.error, OSError) as e:
+                logger.info(f"Evicting dead IMAP session for {key[0]}: {str(e)}")
+                await _close_mailbox(mailbox)
+                continue
+            await _return_to_pool(key, mailbox)
+
+@app.on_event("startup")
+async def check_emails_table():
+    """Check the emails table exists without blocking startup on the Supabase round-trip."""
+    try:
+        logger.info("Checking emails table in Supabase")
+        await asyncio.to_thread(supabase.table("emails").select("id,content_hash,message_id").limit(1).execute)
+    except Exception as e:
+        logger.warning(f"Emails table might not exist: {str(e)}")
+        logger.info("Please create the following table in Supabase:")
+        logger.info("""
+        create table if not exists emails (
+            id bigint generated by default as identity primary key,
+            subject text,
+            from_address text,
+            to_address text,
+            date timestamp with time zone,
+            text text,
+            summary text,
+            content_hash text,
+            message_id text unique,
+            extracted_at timestamp with time zone default timezone('utc'::text, now())
+        );
+        -- Matches the /emails ordering (date desc, nulls first) so pages come from an index scan
+        create index if not exists emails_date_desc_idx on emails (date desc);
+        -- Summary reuse looks rows up by content hash; identical content may recur across emails
+        create index if not exists emails_content_hash_idx on emails (content_hash);
+        -- For tables created by earlier versions:
+        alter table emails add column if not exists content_hash text;
+        alter table emails drop constraint if exists emails_content_hash_key;
+        alter table emails add column if not exists message_id text unique;
+        """)
+
+@app.on_event("startup")
+async def start_mailbox_keepalive():
+    """Start the background task that keeps pooled IMAP sessions alive."""
+    app.state.mailbox_keepalive = asyncio.create_task(_keep_mailboxes_alive())
+
+@app.on_event("shutdown")
+async def close_mailbox_pool():
+    """Log out of all pooled IMAP sessions."""
+    app.state.mailbox_keepalive.cancel()
+    async with _pool_lock:
+        idle_sessions = [mailbox for idle in _mailbox_pool.values() for mailbox in idle]
+        _mailbox_pool.clear()
+    for mailbox in idle_sessions:
+        await _close_mailbox(mailbox)
+    _imap_executor.shutdown(wait=False)
+
+def extract_body(msg) -> str:
+    """Return the plain-text body of a message, truncated to MAX_BODY_CHARS."""
+    if msg.text:
+        return msg.text.strip()[:MAX_BODY_CHARS]
+    if msg.html:
+        # Strip tags so markup doesn't eat into the character budget
+        return BeautifulSoup(msg.html, "lxml").get_text(" ", strip=True)[:MAX_BODY_CHARS]
+    return ""
+
+def _repair_truncated_base64(msg: MailMessage) -> None:
+    """Make base64 parts cut off by a partial fetch decodable again.
+
+    A trailing partial MIME boundary line is removed and remaining non-alphabet
+    characters are dropped, then the payload is re-padded, or a lone trailing character
+    that can't be decoded is removed. Complete payloads come out unchanged.
+    """
+    for part in msg.obj.walk():
+        if part.is_multipart() or part.get("Content-Transfer-Encoding", "").strip().lower() != "base64":
+            continue
+        payload = part.get_payload()
+        # Base64 never contains "--", so a line starting with it is a cut-off boundary
+        boundary_start = payload.rfind("\n--")
+        if boundary_start != -1:
+            payload = payload[:boundary_start]
+        payload = re.sub(r"[^A-Za-z0-9+/]", "", payload)
+        remainder = len(payload) % 4
+        if remainder == 1:
+            payload = payload[:-1]
+        elif remainder:
+            payload += "=" * (4 - remainder)
+        part.set_payload(payload)
+
+def fetch_partial_bodies(mailbox: MailBox, uids: List[str]) -> Dict[str, str]:
+    """Fetch the leading MAX_FETCH_BYTES of each message and return its body text by UID."""
+    bodies = {}
+    message_parts = f"(UID BODY.PEEK[]<0.{MAX_FETCH_BYTES}>)"
+    for i in range(0, len(uids), IMAP_FETCH_BULK):
+        result = mailbox.client.uid("fetch", ",".join(uids[i:i + IMAP_FETCH_BULK]), message_parts)
+        check_command_status(result, MailboxFetchError)
+        # Each message is a (literal, trailing data) pair; some servers send the UID after the literal
+        for fetch_item in chunks(result[1], 2):
+            msg = MailMessage(fetch_item)
+            _repair_truncated_base64(msg)
+            bodies[msg.uid] = extract_body(msg)
+    return bodies
+
+def fetch_from_senders(mailbox: MailBox, sender_addresses: List[str], date_since: datetime) -> List[dict]:
+    """Fetch emails from any of the given senders received since date_since."""
+    utc = pytz.UTC
+    email_data = []
+    errors: List[Tuple[str, str]] = []
+    extracted_at = datetime.now(utc).isoformat()
+
+    logger.info(f"Fetching emails from senders: {', '.join(sender_addresses)}")
+    # A single OR query lets the server do one SEARCH for all senders
+    criteria = AND(
+        OR(from_=sender_addresses),
+        date_gte=date_since.date()
+    )
+    # Headers are enough to apply the date window, so bodies are only fetched for kept messages
+    messages = mailbox.fetch(criteria=criteria, bulk=IMAP_FETCH_BULK, mark_seen=False, headers_only=True)
+    kept = []
+    for msg in messages:
+        try:
+            # Only assume UTC for naive dates; aware dates keep their own offset
+            msg_date = msg.date if msg.date.tzinfo else msg.date.replace(tzinfo=utc)
+            msg_date = msg_date.astimezone(utc)
+            # SINCE only filters by day, so re-check the exact 24 hour window
+            if msg_date >= date_since:
+                kept.append((msg, msg_date))
+        except Exception as e:
+            errors.append((msg.uid or "?", str(e)))
+            continue
+
+    bodies = fetch_partial_bodies(mailbox, [msg.uid for msg, _ in kept])
+    for msg, msg_date in kept:
+        if msg.uid not in bodies:
+            errors.append((msg.uid or "?", "body not returned by server"))
+            continue
+        try:
+            email_content = {
+                "subject": msg.subject,
+                "from_address": msg.from_,
+                "to_address": ", ".join(msg.to),
+                "date": msg_date.isoformat(),
+                "text": bodies[msg.uid],
+                "message_id": message_identity(msg, msg_date),
+                "extracted_at": extracted_at
+            }
+            email_content["content_hash"] = content_hash(email_content)
+            email_data.append(email_content)
+            logger.debug(f"Processed email: {msg.subject[:30]}...")
+        except Exception as e:
+            errors.append((msg.uid or "?", str(e)))
+            continue
+
+    # Failures are reported once per fetch instead of per message
+    if errors:
+        logger.warning(f"{len(errors)} emails failed to process: {errors[:10]}")
+    return email_data
+
+async def extract_emails_from_inbox(
+    email_address: str,
+    password: str,
+    sender_addresses: List[str],
+    queue: Optional[asyncio.Queue] = None
+) -> List[dict]:
+    """Extract and summarize emails from specified senders in the last 24 hours.
 
-def extract_emails_from_inbox(email_address: str, password: str, sender_addresses: List[str]) -> List[dict]:
-    """Extract emails from specified senders in the last 24 hours."""
+    If a queue is given, each email is put on it as soon as it has been summarized.
+    """
     email_data = []
     
     try:
@@ -109,81 +464,41 @@ def extract_emails_from_inbox(email_address: str, password: str, sender_addresse
         utc = pytz.UTC
         date_since = datetime.now(utc) - timedelta(days=1)
         
-        # Try alternative IMAP settings
-        import imaplib
-        import email
-        from email.header import decode_header
-        
-        # Set up SSL context
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        
         try:
-            # Connect using imaplib first to test connection
-            logger.debug("Attempting direct IMAP connection...")
-            imap = imaplib.IMAP4_SSL('imap.zoho.eu', 993, ssl_context=ssl_context)
-            
-            try:
-                # Try login
-                logger.debug(f"Attempting login for {email_address}")
-                imap.login(email_address, password)
-                imap.logout()
-                
-                # If login successful, proceed with imap_tools
-                logger.debug("Login successful, proceeding with email fetch")
-                with MailBox('imap.zoho.eu').login(email_address, password, initial_folder='INBOX') as mailbox:
-                    logger.info("Successfully connected to Zoho")
-                    
-                    for sender in sender_addresses:
-                        logger.info(f"Fetching emails from sender: {sender}")
-                        criteria = AND(
-                            from_=sender,
-                            date_gte=date_since.date()
-                        )
-                        messages = mailbox.fetch(criteria=criteria)
-                        for msg in messages:
-                            try:
-                                msg_date = msg.date.replace(tzinfo=utc)
-                                if msg_date >= date_since:
-                                    email_content = {
-                                        "subject": msg.subject,
-                                        "from_address": msg.from_,
-                                        "to_address": ", ".join(msg.to),
-                                        "date": msg_date.isoformat(),
-                                        "text": msg.text or msg.html,
-                                        "extracted_at": datetime.now(utc).isoformat()
-                                    }
-                                    
-                                    email_content["summary"] = summarize_single_email(email_content)
-                                    email_data.append(email_content)
-                                    logger.info(f"Processed email: {msg.subject[:30]}...")
-                            except Exception as e:
-                                logger.error(f"Error processing individual email: {str(e)}")
-                                continue
-                    
-                    logger.info(f"Successfully extracted {len(email_data)} emails")
-                    return email_data
-                    
-            except imaplib.IMAP4.error as e:
-                error_msg = str(e)
-                logger.error(f"IMAP Authentication Error: {error_msg}")
-                raise HTTPException(
-                    status_code=401,
-                    detail={
-                        "message": "Failed to authenticate with IMAP server",
-                        "error": error_msg,
-                        "email": email_address,
-                        "server": "imap.zoho.eu",
-                        "suggestions": [
-                            "Verify email address is correct",
-                            "Make sure IMAP is enabled in Zoho Mail settings",
-                            "Try generating a new app-specific password",
-                            "Check if there are any IP restrictions in Zoho settings"
-                        ]
-                    }
-                )
+            if sender_addresses:
+                loop = asyncio.get_running_loop()
+                mailbox = await get_mailbox(email_address, password)
+                try:
+                    email_data = await loop.run_in_executor(
+                        _imap_executor, fetch_from_senders, mailbox, sender_addresses, date_since
+                    )
+                finally:
+                    await release_mailbox(email_address, password, mailbox)
+
+            logger.info(f"Successfully extracted {len(email_data)} emails")
+
+            # Summarize all fetched emails concurrently
+            await summarize_emails(email_data, queue)
+            return email_data
                 
+        except (imaplib.IMAP4.error, MailboxLoginError) as e:
+            error_msg = str(e)
+            logger.error(f"IMAP Authentication Error: {error_msg}")
+            raise HTTPException(
+                status_code=401,
+                detail={
+                    "message": "Failed to authenticate with IMAP server",
+                    "error": error_msg,
+                    "email": email_address,
+                    "server": IMAP_SERVER,
+                    "suggestions": [
+                        "Verify email address is correct",
+                        "Make sure IMAP is enabled in Zoho Mail settings",
+                        "Try generating a new app-specific password",
+                        "Check if there are any IP restrictions in Zoho settings"
+                    ]
+                }
+            )
         except Exception as e:
             error_msg = str(e)
             logger.error(f"Connection Error: {error_msg}")
@@ -193,10 +508,12 @@ def extract_emails_from_inbox(email_address: str, password: str, sender_addresse
                     "message": "Failed to connect to IMAP server",
                     "error": error_msg,
                     "email": email_address,
-                    "server": "imap.zoho.eu"
+                    "server": IMAP_SERVER
                 }
             )
     
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = str(e)
         logger.error(f"General error in extract_emails_from_inbox: {error_msg}")
@@ -209,17 +526,98 @@ def extract_emails_from_inbox(email_address: str, password: str, sender_addresse
             }
         )
 
+async def store_emails(emails: List[dict], overwrite: bool = False) -> int:
+    """Insert a batch of emails in one request and return how many rows were stored.
+
+    Rows whose message_id is already stored are skipped, unless overwrite is set,
+    in which case the stored row is updated (used for newly generated summaries).
+    """
+    try:
+        response = await asyncio.to_thread(
+            supabase.table("emails").upsert(
+                emails, on_conflict="message_id", ignore_duplicates=not overwrite
+            ).execute
+        )
+        return len(response.data)
+    except Exception as e:
+        # Bulk insert is atomic, so fall back to per-row inserts to keep the good rows
+        logger.error(f"Bulk insert failed, retrying row by row: {str(e)}")
+        stored_count = 0
+        for email_data in emails:
+            try:
+                response = await asyncio.to_thread(
+                    supabase.table("emails").upsert(
+                        email_data, on_conflict="message_id", ignore_duplicates=not overwrite
+                    ).execute
+                )
+                stored_count += len(response.data)
+                logger.info(f"Stored email: {email_data['subject'][:30]}...")
+            except Exception as e:
+                logger.error(f"Failed to store email: {str(e)}")
+                continue
+        return stored_count
+
+async def batch_writer(queue: asyncio.Queue) -> int:
+    """Store (email, overwrite) pairs from the queue in batches until a None sentinel arrives.
+
+    A batch is written once it reaches INSERT_CHUNK_SIZE emails or INSERT_FLUSH_SECONDS
+    after its first email, whichever comes first. Returns the number of rows stored.
+    """
+    loop = asyncio.get_running_loop()
+    stored_count = 0
+    while True:
+        item = await queue.get()
+        if item is None:
+            return stored_count
+
+        batch = [item]
+        finished = False
+        deadline = loop.time() + INSERT_FLUSH_SECONDS
+        while len(batch) < INSERT_CHUNK_SIZE:
+            try:
+                item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                finished = True
+                break
+            batch.append(item)
+
+        new_emails = [email_content for email_content, overwrite in batch if not overwrite]
+        # A merge upsert fails if it touches the same row twice, so keep one email per message_id
+        regenerated = list({
+            email_content["message_id"]: email_content for email_content, overwrite in batch if overwrite
+        }.values())
+        if new_emails:
+            stored_count += await store_emails(new_emails)
+        if regenerated:
+            stored_count += await store_emails(regenerated, overwrite=True)
+        if finished:
+            return stored_count
+
 @app.post("/extract")
 async def extract_from_email(request: EmailRequest):
     """Extract emails from specified senders in the last 24 hours and store them with summaries."""
+    global _emails_cache_version
     try:
         logger.info(f"Starting email extraction for: {request.email_address}")
-        # Extract emails from the inbox
-        extracted_emails = extract_emails_from_inbox(
-            request.email_address,
-            request.password,
-            request.sender_addresses
-        )
+        # Summarized emails are stored in Supabase while the rest are still being summarized
+        queue: asyncio.Queue = asyncio.Queue()
+        writer = asyncio.create_task(batch_writer(queue))
+        try:
+            # Extract emails from the inbox
+            extracted_emails = await extract_emails_from_inbox(
+                request.email_address,
+                request.password,
+                request.sender_addresses,
+                queue
+            )
+        finally:
+            await queue.put(None)
+            stored_count = await writer
+        logger.info(f"Stored {stored_count} emails")
+        if stored_count:
+            _emails_cache_version += 1
         
         if not extracted_emails:
             logger.warning("No emails found in the last 24 hours from specified senders")
@@ -228,18 +626,6 @@ async def extract_from_email(request: EmailRequest):
                 "senders_processed": request.sender_addresses
             }
         
-        # Store in Supabase
-        logger.info("Storing emails in Supabase")
-        stored_count = 0
-        for email_data in extracted_emails:
-            try:
-                response = supabase.table("emails").insert(email_data).execute()
-                stored_count += 1
-                logger.info(f"Stored email: {email_data['subject'][:30]}...")
-            except Exception as e:
-                logger.error(f"Failed to store email: {str(e)}")
-                continue
-        
         return {
             "message": "Emails extracted and stored successfully",
             "emails_found": len(extracted_emails),
@@ -254,21 +640,53 @@ async def extract_from_email(request: EmailRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/emails")
-async def get_emails():
-    """Retrieve all stored emails with their summaries."""
+async def get_emails(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    include_body: bool = False
+):
+    """Retrieve a page of stored emails with their summaries, newest first."""
+    cache_key = (_emails_cache_version, limit, offset, include_body)
+    # Single lookup, so an entry can't expire between a membership test and the read
+    cached = _emails_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        logger.info("Retrieving emails from Supabase")
-        response = supabase.table("emails").select("*").order('date.desc').execute()
-        emails = response.data
+        logger.info(f"Retrieving emails from Supabase (limit={limit}, offset={offset})")
+        # Email bodies can be large, so only return them when asked for
+        columns = "id,subject,from_address,date,summary" + (",text" if include_body else "")
+        try:
+            response = await asyncio.to_thread(
+                supabase.table("emails")
+                .select(columns, count="exact")
+                .order("date", desc=True)
+                .range(offset, offset + limit - 1)
+                .execute
+            )
+            emails, total_count = response.data, response.count
+        except APIError as e:
+            # PostgREST rejects a range starting past the last row; still report the total
+            if e.code != "PGRST103":
+                raise
+            response = await asyncio.to_thread(
+                supabase.table("emails").select("id", count="exact").limit(1).execute
+            )
+            emails, total_count = [], response.count
         
-        if not emails:
+        if not total_count:
             logger.warning("No emails found in database")
-            return {"message": "No emails found in database"}
+            result = {"message": "No emails found in database"}
+        else:
+            result = {
+                "emails": emails,
+                "total_count": total_count,
+                "limit": limit,
+                "offset": offset
+            }
         
-        return {
-            "emails": emails,
-            "total_count": len(emails)
-        }
+        _emails_cache[cache_key] = result
+        return result
     
     except Exception as e:
         logger.error(f"Error in get_emails: {str(e)}")